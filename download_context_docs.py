@@ -1,40 +1,260 @@
 import os
 import json
+import logging
+import argparse
 import time
 import re
 import random
+import shutil
+import hashlib
+import sqlite3
+import tempfile
+import fcntl
+import threading
+import queue
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from urllib.parse import quote
+from urllib.parse import urlencode, urlparse
+import requests
+from requests.adapters import HTTPAdapter
+import lxml.html
 from selenium import webdriver
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.chrome.service import Service
 from selenium.webdriver.chrome.options import Options
-from selenium.common.exceptions import TimeoutException, NoSuchElementException
+from selenium.common.exceptions import TimeoutException, NoSuchElementException, WebDriverException
+
+try:
+    import orjson
+    _json_loads = orjson.loads
+except ImportError:
+    _json_loads = json.loads
+
+log = logging.getLogger("xpcs.scholar")
+log.addHandler(logging.NullHandler())
 
 
 # --------------------------------------------------------------------------------
+# requires:
+# pip install selenium requests lxml cssselect
+#
 # run with:
-# python3 download_context_docs.py
+# python3 download_context_docs.py                          # all citations
+# python3 download_context_docs.py --start 101 --count 15   # citations 101 - 115
+# python3 download_context_docs.py --start 101 --end 115     # same
+# python3 download_context_docs.py --pending 15              # next 15 not downloaded yet
+#
+# to keep one warm Chrome between runs, start it once with
+# google-chrome --headless=new --remote-debugging-port=9222 --user-data-dir=/tmp/xpcs_profile
+# and pass --debugger-address 127.0.0.1:9222; runs sharing it take turns through a
+# lockfile in the temp directory
+#
+# each worker's Chrome keeps its cookies in .chrome_profile/w<N>; if Scholar keeps
+# asking for a CAPTCHA, solve one in that profile once, e.g.
+# google-chrome --user-data-dir=.chrome_profile/w0 https://scholar.google.com
 # --------------------------------------------------------------------------------
 
-class GoogleScholarPDFDownloader:
-    def __init__(self):
-        self.output_dir = "xpcs_publications"
-        os.makedirs(self.output_dir, exist_ok=True)
-        self.download_log = []
-        self.setup_driver()
+# all 115 citations present in the 2018 review, one JSON string per line
+CITATIONS_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "citations.jsonl")
+
+SCHOLAR_URL = "https://scholar.google.com/scholar"
+
+USER_AGENT = "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
+
+# number of workers searching Google Scholar at the same time
+NUM_WORKERS = 4
+
+# Chrome profiles kept between runs so Scholar's cookies survive; Chrome locks a
+# profile while it's open, so each worker gets its own
+CHROME_PROFILE_DIR = ".chrome_profile"
+
+# how many times to retry a search that Scholar answers with a CAPTCHA, and the
+# base of the exponential backoff between attempts (seconds, capped at 60)
+GS_MAX_RETRIES = 3
+GS_BACKOFF_BASE = 5
+
+# returns the href of every PDF link on a Scholar result page, deduplicated
+PDF_LINKS_JS = """
+const links = [...document.querySelectorAll('div.gs_or_ggsm a'), ...document.querySelectorAll('a')];
+const hrefs = links
+    .filter(a => a.href && (a.textContent.includes('[PDF]') || a.href.endsWith('.pdf')))
+    .map(a => a.href);
+return [...new Set(hrefs)];
+"""
+
+# Google Scholar queries allowed per minute across all workers, with bursts of up to this many
+SCHOLAR_QUERIES_PER_MINUTE = 8
+
+# how many PDFs may be downloaded from the same host at once, across all workers
+DOWNLOADS_PER_HOST = 2
+
+# how many hosts keep their idle connections open in the shared session; PDFs come from
+# many publishers and mirrors, and the default of 10 would drop warm TLS connections
+HOST_POOLS = 32
+
+# chunk size for streaming PDFs to disk
+WRITE_BUFFER_SIZE = 1024 * 1024
+
+# resources the Chrome fallback never needs to fetch from a Scholar page
+BLOCKED_URL_PATTERNS = [
+    "*.png", "*.jpg", "*.jpeg", "*.gif",
+    "*.css", "*.woff", "*.woff2", "*.ttf",
+    "*google-analytics*", "*doubleclick*"
+]
+
+# publication year and first author's surname, used to name the downloaded PDFs
+_YEAR_RE = re.compile(r'\b(?:19|20)\d{2}\b')
+_AUTHOR_RE = re.compile(r'^([A-Za-z]+)')
+
+
+def build_filename(citation, index):
+    """build the NNN_Author_YYYY.pdf name for a citation"""
+    year_match = _YEAR_RE.search(citation)
+    year = year_match.group() if year_match else ""
+    author_match = _AUTHOR_RE.match(citation)
+    author = author_match.group(1) if author_match else ""
+    
+    return f"{index:03d}_{author}_{year}.pdf"
+
+
+# everything a worker needs to know about one citation, worked out once per batch
+ParsedCitation = namedtuple("ParsedCitation", ["index", "citation", "filename", "search_url"])
+
+
+def iter_citations(path, start=1, count=None):
+    """yield citations from a JSON Lines file, starting at citation number `start`"""
+    with open(path, encoding='utf-8') as f:
+        for i, line in enumerate(f, 1):
+            if i < start:
+                continue
+            if count is not None and i >= start + count:
+                break
+            yield _json_loads(line)
+
+
+def parse_citations(citations, start_index=1):
+    """build a ParsedCitation for each citation in a single pass"""
+    parsed = []
+    for index, citation in enumerate(citations, start_index):
+        citation = citation.strip()
+        # encoded once here; the HTTP search, the browser fallback and the manual URL all reuse it
+        search_url = f"{SCHOLAR_URL}?{urlencode({'q': citation})}"
+        parsed.append(ParsedCitation(index, citation, build_filename(citation, index), search_url))
+    return parsed
+
+
+def check_download_complete(path):
+    """check that a downloaded PDF exists and isn't empty"""
+    return os.path.isfile(path) and os.path.getsize(path) > 0
+
+
+def write_stream(path, response, head=b""):
+    """write head and then the rest of a streamed response to path, in large unbuffered writes"""
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+    try:
+        # reserve the whole file up front when the size is known so it isn't fragmented;
+        # only an optimization, so a filesystem that refuses (e.g. ZFS) or a bad header is ignored
+        try:
+            length = int(response.headers.get('Content-Length') or 0)
+            if length and hasattr(os, "posix_fallocate"):
+                os.posix_fallocate(fd, 0, length)
+        except (OSError, ValueError):
+            pass
+        
+        written = 0
+        chunk = head or response.raw.read(WRITE_BUFFER_SIZE)
+        while chunk:
+            view = memoryview(chunk)
+            while view:
+                view = view[os.write(fd, view):]
+            written += len(chunk)
+            chunk = response.raw.read(WRITE_BUFFER_SIZE)
+        
+        # Content-Length counts compressed bytes, so the reserved size can be too large
+        os.ftruncate(fd, written)
+        
+        # nothing reads these PDFs back, so keep them from crowding the page cache
+        if hasattr(os, "posix_fadvise"):
+            os.fdatasync(fd)
+            os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+    finally:
+        os.close(fd)
+
+
+class TokenBucket:
+    """thread-safe token bucket for pacing requests shared by several workers"""
+    def __init__(self, capacity, refill_per_sec, cooldown=300):
+        self.capacity = capacity
+        self.refill_per_sec = refill_per_sec
+        self.base_refill_per_sec = refill_per_sec
+        self.cooldown = cooldown
+        self.recover_at = 0
+        self.tokens = capacity
+        self.last_refill = time.monotonic()
+        self.lock = threading.Lock()
+    
+    def throttle(self):
+        """halve the refill rate and drop any saved-up burst, e.g. after a CAPTCHA"""
+        with self.lock:
+            self.refill_per_sec = max(self.base_refill_per_sec / 8, self.refill_per_sec / 2)
+            self.tokens = min(self.tokens, 0)
+            self.recover_at = time.monotonic() + self.cooldown
+    
+    def acquire(self):
+        """block until a token is available, then take it"""
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.last_refill) * self.refill_per_sec)
+                self.last_refill = now
+                
+                # after a quiet cool-down, double the rate back up one step at a time
+                if self.refill_per_sec < self.base_refill_per_sec and now >= self.recover_at:
+                    self.refill_per_sec = min(self.base_refill_per_sec, self.refill_per_sec * 2)
+                    self.recover_at = now + self.cooldown
+                
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                
+                wait = (1 - self.tokens) / self.refill_per_sec
+            
+            time.sleep(wait)
+
+
+class Worker:
+    """one search thread with a headless Chrome fallback and its own download directory"""
+    def __init__(self, downloader, worker_id):
+        self.downloader = downloader
+        self.worker_id = worker_id
+        self.output_dir = downloader.output_dir
+        # each worker gets its own download directory so concurrent downloads don't get mixed up
+        self.download_dir = os.path.join(self.output_dir, f"w{worker_id}")
+        os.makedirs(self.download_dir, exist_ok=True)
+        
+        # all workers share one keep-alive session for the result pages and PDFs
+        self.session = downloader.session
+        
+        # Chrome is only started if Scholar answers the plain HTTP request with a CAPTCHA
+        self.driver = None
     
     def setup_driver(self):
-        """setup Chrome driver with options"""
+        """setup headless Chrome driver with options, or attach to an already running Chrome"""
+        if self.downloader.debugger_address:
+            self.attach_driver(self.downloader.debugger_address)
+            return
+        
         chrome_options = Options()
         
         prefs = {
-            "download.default_directory": os.path.abspath(self.output_dir),
+            "download.default_directory": os.path.abspath(self.download_dir),
             "download.prompt_for_download": False,
             "download.directory_upgrade": True,
-            "plugins.always_open_pdf_externally": True  # download PDFs instead of opening them
+            "plugins.always_open_pdf_externally": True,  # download PDFs instead of opening them
+            "profile.managed_default_content_settings.images": 2  # the scraper never looks at images
         }
         chrome_options.add_experimental_option("prefs", prefs)
         
@@ -42,169 +262,354 @@ class GoogleScholarPDFDownloader:
         chrome_options.add_experimental_option("excludeSwitches", ["enable-automation"])
         chrome_options.add_experimental_option('useAutomationExtension', False)
 
-        chrome_options.add_argument("user-agent=Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36")
+        chrome_options.add_argument(f"user-agent={USER_AGENT}")
         
-        # commenting out to see the browser actions happen in real time
-        # chrome_options.add_argument("--headless")
+        # reuse this worker's profile from earlier runs; a fresh, cookie-less browser
+        # is what Scholar is quickest to show a CAPTCHA to
+        profile_dir = os.path.abspath(os.path.join(CHROME_PROFILE_DIR, f"w{self.worker_id}"))
+        # the profile lives in the Default subdirectory, which is also where chromedriver
+        # writes the prefs above, so don't pick another one with --profile-directory
+        chrome_options.add_argument(f"--user-data-dir={profile_dir}")
+        
+        # several browsers run at once, so keep them off screen
+        chrome_options.add_argument("--headless=new")
+        
+        # don't decode images or fetch web fonts; nothing on the page is looked at
+        chrome_options.add_argument("--blink-settings=imagesEnabled=false")
+        chrome_options.add_argument("--disable-remote-fonts")
         
         self.driver = webdriver.Chrome(options=chrome_options)
     
         self.driver.execute_script("Object.defineProperty(navigator, 'webdriver', {get: () => undefined})")
+        
+        self.block_unneeded_resources()
+    
+    def attach_driver(self, debugger_address):
+        """drive a new tab in a long-lived Chrome started with --remote-debugging-port"""
+        # an attached browser was already launched with its own flags and prefs,
+        # so only the debugger address may be passed here
+        chrome_options = Options()
+        chrome_options.debugger_address = debugger_address
+        
+        # another run attached to the same Chrome would move this run's downloads
+        self.downloader.lock_debugger()
+        self.driver = webdriver.Chrome(options=chrome_options)
+        self.driver.switch_to.new_window('tab')
+        
+        self.block_unneeded_resources()
+    
+    def claim_downloads(self):
+        """point an attached Chrome's downloads at this worker's directory"""
+        # the download prefs can't be set on a running browser, and this sets them for
+        # the whole browser, so it's redone by whichever worker holds the browser lock
+        self.driver.execute_cdp_cmd("Browser.setDownloadBehavior", {
+            "behavior": "allow",
+            "downloadPath": os.path.abspath(self.download_dir)
+        })
     
-    def add_delay(self, min_seconds=2, max_seconds=5):
-        """add random delay"""
-        delay = random.uniform(min_seconds, max_seconds)
-        time.sleep(delay)
+    def block_unneeded_resources(self):
+        """skip images, stylesheets, fonts and trackers; only the result HTML is needed"""
+        self.driver.execute_cdp_cmd("Network.enable", {})
+        self.driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": BLOCKED_URL_PATTERNS})
+    
+    def _ensure_driver(self):
+        """start Chrome if needed, or restart it if its session has died"""
+        if self.driver is not None:
+            try:
+                self.driver.current_url  # cheap round trip to check the session is still alive
+                return
+            except WebDriverException:
+                log.warning("[w%d] Chrome session was lost, restarting it...", self.worker_id)
+                try:
+                    self.driver.quit()
+                except Exception:
+                    pass
+        
+        self.setup_driver()
+    
+    def close(self):
+        """close the browser, if one was started, or just this worker's tab if attached"""
+        if self.driver is None:
+            return
+        try:
+            if self.downloader.debugger_address:
+                # hand downloads back to the browser's own settings and leave the shared
+                # Chrome running for the next batch
+                try:
+                    self.driver.execute_cdp_cmd("Browser.setDownloadBehavior", {"behavior": "default"})
+                finally:
+                    self.driver.close()
+            self.driver.quit()
+        except WebDriverException as e:
+            # a dead session mustn't stop the remaining workers from being closed
+            log.warning("[w%d] Could not close Chrome cleanly: %s", self.worker_id, e)
+    
+    def pause_for_captcha(self, attempt):
+        """back off exponentially from a CAPTCHA, holding every other worker until the wait is over"""
+        delay = min(60, GS_BACKOFF_BASE * 2 ** attempt + random.uniform(0, 2))
+        log.warning("[w%d] Pausing all workers for %.1f seconds (attempt %d/%d)...",
+                    self.worker_id, delay, attempt, GS_MAX_RETRIES)
+        
+        self.downloader.pause_scholar(delay)
+        self.downloader.wait_for_scholar()
     
-    def search_and_download(self, citation, index):
+    def is_captcha_page(self, response):
+        """check if Scholar answered with its CAPTCHA interstitial instead of results"""
+        if response.status_code in (429, 503) or "/sorry/" in response.url:
+            return True
+        # work on the raw bytes; response.text would run charset detection over the whole page
+        return b"captcha" in response.content.lower() and b'class="gs_r' not in response.content
+    
+    def search_and_download(self, entry):
         """search Google Scholar and attempt to download PDF"""
-        print(f"\n{'='*60}")
-        print(f"Citation #{index}: {citation[:80]}...")
+        citation, index, filename = entry.citation, entry.index, entry.filename
         
-        search_url = f"https://scholar.google.com/scholar?q={quote(citation)}"
-        print(f"Searching: {search_url}")
+        log.info("[w%d] Citation #%d: %.80s...", self.worker_id, index, citation)
+        log.debug("Searching: %s", entry.search_url)
         
         try:
-            # navigate to Google Scholar
-            self.driver.get(search_url)
-            self.add_delay(2, 4)
-            
-            # check if it got blocked
-            if "captcha" in self.driver.current_url.lower() or "sorry" in self.driver.title.lower():
-                print("Google Scholar is asking for CAPTCHA. Waiting longer...")
-                self.add_delay(30, 60)
+            result = self.search_with_retries(entry)
+            if result is None:
+                log.warning("Google Scholar kept asking for CAPTCHA after %d attempts", GS_MAX_RETRIES)
+                self.downloader.log({
+                    'status': 'failed',
+                    'citation': citation,
+                    'reason': 'Blocked by CAPTCHA'
+                })
+                self.save_manual_url(citation, index, entry.search_url)
                 return False
             
-            # wait for results to load
-            wait = WebDriverWait(self.driver, 10)
-            
-            # look for PDF links
-            pdf_found = False
-            
-            # method 1: look for PDF links - they're usually in a div with class gs_or_ggsm
-            try:
-                # wait for search results to load
-                wait.until(EC.presence_of_element_located((By.CLASS_NAME, "gs_r")))
-                
-                # find PDF links - they're in divs with class gs_or_ggsm
-                pdf_elements = self.driver.find_elements(By.CSS_SELECTOR, "div.gs_or_ggsm a")
-                
-                print(f"Found {len(pdf_elements)} potential PDF links")
-                
-                for element in pdf_elements:
-                    link_text = element.text
-                    href = element.get_attribute('href')
-                    
-                    print(f"  - Link text: '{link_text}', URL: {href[:50]}...")
-                    
-                    # check if this is a PDF link
-                    if '[PDF]' in link_text or href.endswith('.pdf'):
-                        print(f"Found PDF link: {href}")
-                        
-                        # click the link to download
-                        print("Clicking PDF link...")
-                        element.click()
-                        self.add_delay(3, 5)
-                        
-                        # wait for download to complete
-                        time.sleep(5)
-                        
-                        # check if PDF was downloaded
-                        if self.check_download_complete(citation, index):
-                            pdf_found = True
-                            break
-                
-                # alternative: try looking for any link with [PDF] text
-                if not pdf_found:
-                    print("\nTrying alternative PDF link search...")
-                    pdf_links = self.driver.find_elements(By.XPATH, "//a[contains(., '[PDF]')]")
-                    
-                    for link in pdf_links:
-                        href = link.get_attribute('href')
-                        print(f"Found alternative PDF link: {href}")
-                        
-                        link.click()
-                        self.add_delay(3, 5)
-                        time.sleep(5)
-                        
-                        if self.check_download_complete(citation, index):
-                            pdf_found = True
-                            break
-                
-            except Exception as e:
-                print(f"Error finding PDF links: {e}")
-                
-                # debug: print page source snippet to see what's there
-                try:
-                    results = self.driver.find_elements(By.CLASS_NAME, "gs_r")
-                    if results:
-                        print("\nDebug - First result HTML snippet:")
-                        print(results[0].get_attribute('innerHTML')[:500])
-                except:
-                    pass
-            
-            if pdf_found:
-                self.download_log.append({
+            pdf_url, page_url = result
+            path = os.path.join(self.output_dir, filename)
+            if pdf_url and check_download_complete(path):
+                self.downloader.log({
                     'status': 'success',
                     'citation': citation,
                     'index': index
                 })
+                self.downloader.cache_store(citation, 'success', pdf_url, path)
                 return True
             else:
-                print("Could not find or download PDF")
-                self.download_log.append({
+                log.info("Could not find or download PDF")
+                self.downloader.log({
                     'status': 'failed',
                     'citation': citation,
                     'reason': 'No PDF found or download failed'
                 })
                 
                 # save the page URL for manual access
-                self.save_manual_url(citation, index, self.driver.current_url)
+                self.save_manual_url(citation, index, page_url)
                 return False
                 
         except Exception as e:
-            print(f"Error during search: {e}")
-            self.download_log.append({
+            log.error("Error during search: %s", e)
+            self.downloader.log({
                 'status': 'error',
                 'citation': citation,
                 'error': str(e)
             })
             return False
     
-    def check_download_complete(self, citation, index):
-        """check if a PDF was downloaded and rename it"""
+    def search_with_retries(self, entry):
+        """search Scholar, returns (pdf_url, page_url) or None if every attempt hit a CAPTCHA"""
+        for attempt in range(1, GS_MAX_RETRIES + 1):
+            # don't send anything to Scholar while some worker is waiting out a CAPTCHA
+            self.downloader.wait_for_scholar()
+            self.downloader.scholar_limiter.acquire()
+            
+            # the result page is static HTML, so a plain GET is enough most of the time
+            response = self.session.get(entry.search_url, timeout=10)
+            
+            if not self.is_captcha_page(response):
+                response.raise_for_status()
+                return self.download_from_results(response, entry.filename), response.url
+            
+            log.warning("Google Scholar answered with a CAPTCHA page. Retrying in the browser...")
+            self.downloader.scholar_limiter.throttle()
+            result = self.search_with_browser(entry)
+            if result is not None:
+                return result
+            
+            if attempt < GS_MAX_RETRIES:
+                self.pause_for_captcha(attempt)
+        
+        return None
+    
+    def download_from_results(self, response, filename):
+        """find PDF links in a Scholar result page, download the first one that works and return its URL"""
+        # let lxml decode the bytes itself instead of going through response.text
+        tree = lxml.html.fromstring(response.content, base_url=response.url)
+        tree.make_links_absolute()
+        
+        # PDF links are in divs with class gs_or_ggsm
+        links = tree.cssselect("div.gs_or_ggsm a")
+        log.debug("Found %d potential PDF links", len(links))
+        
+        for link in links:
+            link_text = link.text_content()
+            href = link.get('href')
+            if not href:
+                continue
+            
+            log.debug("  - Link text: '%s', URL: %.50s...", link_text, href)
+            
+            # check if this is a PDF link
+            if '[PDF]' in link_text or href.endswith('.pdf'):
+                log.debug("Found PDF link: %s", href)
+                if self.download_pdf(href, filename):
+                    return href
+        
+        return None
+    
+    def browser_cookies(self):
+        """copy the cookies of the browser's current page into a jar for the HTTP session"""
+        jar = requests.cookies.RequestsCookieJar()
+        for cookie in self.driver.get_cookies():
+            jar.set(cookie['name'], cookie['value'], domain=cookie.get('domain'), path=cookie.get('path', '/'))
+        return jar
+    
+    def download_pdf(self, url, filename, cookies=None):
+        """stream a PDF straight to its final filename"""
+        path = os.path.join(self.output_dir, filename)
+        partial_path = path + ".part"
+        
         try:
-            # extract filename info
-            year_match = re.search(r'\b(19|20)\d{2}\b', citation)
-            year = year_match.group() if year_match else ""
-            author_match = re.match(r'^([A-Za-z]+)', citation)
-            author = author_match.group(1) if author_match else ""
+            # several workers can land on the same publisher, so cap the downloads per host
+            with self.downloader.host_slot(url), \
+                    self.session.get(url, cookies=cookies, stream=True, timeout=30) as response:
+                response.raise_for_status()
+                response.raw.decode_content = True  # undo any gzip/deflate content encoding
+                
+                # [PDF] links sometimes lead to an HTML landing page, so check the magic bytes first
+                magic = response.raw.read(4)
+                if magic != b"%PDF":
+                    log.info("Link did not return a PDF (Content-Type: %s)", response.headers.get('Content-Type'))
+                    return False
+                
+                write_stream(partial_path, response, magic)
             
-            filename = f"{index:03d}_{author}_{year}.pdf"
+            os.replace(partial_path, path)
+            log.info("Downloaded: %s", filename)
+            return True
             
-            # find the most recent PDF in the download directory
-            pdf_files = [f for f in os.listdir(self.output_dir) if f.endswith('.pdf')]
+        except Exception as e:
+            log.warning("Error downloading PDF: %s", e)
+            if os.path.exists(partial_path):
+                os.remove(partial_path)
+            return False
+    
+    def search_with_browser(self, entry):
+        """search Google Scholar in Chrome, returns (pdf_url, page_url) or None if blocked"""
+        if self.downloader.browser_lock is None:
+            return self._search_with_browser(entry)
+        
+        # an attached Chrome has one download directory for all its tabs, so the workers
+        # take turns in it; the plain HTTP path above stays parallel
+        with self.downloader.browser_lock:
+            return self._search_with_browser(entry)
+    
+    def _search_with_browser(self, entry):
+        # cookies are never cleared: the profile (or the attached browser) keeps Scholar's
+        # cookies and any CAPTCHA solved in it, which is what keeps the next one away
+        self._ensure_driver()
+        if self.downloader.debugger_address:
+            self.claim_downloads()
+        
+        # navigate to Google Scholar
+        self.downloader.wait_for_scholar()
+        self.downloader.scholar_limiter.acquire()
+        self.driver.get(entry.search_url)
+        
+        # one wait for either the results or the CAPTCHA page, returning as soon as one shows up
+        try:
+            WebDriverWait(self.driver, 10).until(EC.any_of(
+                EC.presence_of_element_located((By.CLASS_NAME, "gs_r")),
+                EC.title_contains("sorry"),
+                EC.url_contains("captcha"),
+            ))
+        except TimeoutException:
+            pass
+        
+        # check if it got blocked
+        if "captcha" in self.driver.current_url.lower() or "sorry" in self.driver.title.lower():
+            log.warning("Google Scholar is asking for CAPTCHA in the browser too")
+            return None
+        
+        # look for PDF links
+        pdf_url = None
+        page_url = self.driver.current_url
+        
+        try:
+            # collect every PDF link in one round trip - the ones in div.gs_or_ggsm first,
+            # then any other [PDF] or .pdf link on the page
+            pdf_hrefs = self.driver.execute_script(PDF_LINKS_JS)
             
-            if pdf_files:
-                # get the most recent file
-                latest_pdf = max(pdf_files, key=lambda f: os.path.getctime(os.path.join(self.output_dir, f)))
-                latest_path = os.path.join(self.output_dir, latest_pdf)
+            log.debug("Found %d potential PDF links", len(pdf_hrefs))
+            
+            for href in pdf_hrefs:
+                log.debug("Found PDF link: %s", href)
+                
+                # fetch the link over the pooled session with the browser's cookies, skipping
+                # Chrome's download manager and the polling below; Chrome only gets the link
+                # if that doesn't return a PDF (e.g. a page that needs JavaScript first)
+                if self.download_pdf(href, entry.filename, cookies=self.browser_cookies()):
+                    pdf_url = href
+                    break
+                
+                # only this worker downloads into its directory, so whatever appears
+                # after this snapshot belongs to this link
+                snapshot = set(os.listdir(self.download_dir))
                 
-                # check if this file was created in the last 10 seconds
-                if time.time() - os.path.getctime(latest_path) < 10:
-                    # rename to our naming convention
-                    new_path = os.path.join(self.output_dir, filename)
-                    if latest_path != new_path:
-                        os.rename(latest_path, new_path)
-                        print(f"Downloaded and renamed to: {filename}")
-                    else:
-                        print(f"Downloaded: {filename}")
-                    return True
+                # open the link to start the download
+                log.debug("Opening PDF link in the browser...")
+                self.driver.get(href)
+                
+                # wait for download to complete; no fixed sleep first, the wait returns as soon as it's done
+                if self.wait_for_download(entry.filename, snapshot):
+                    pdf_url = href
+                    break
+            
+        except Exception as e:
+            log.warning("Error finding PDF links: %s", e)
+            
+            # debug: log a page source snippet to see what's there, only fetched when it'll be shown
+            if log.isEnabledFor(logging.DEBUG):
+                try:
+                    results = self.driver.find_elements(By.CLASS_NAME, "gs_r")
+                    if results:
+                        log.debug("First result HTML snippet:\n%.500s", results[0].get_attribute('innerHTML'))
+                except:
+                    pass
+        
+        return pdf_url, page_url
+    
+    def wait_for_download(self, filename, snapshot, timeout=30):
+        """wait for a new PDF to land in the download directory and rename it"""
+        def download_done(driver):
+            new_files = [f for f in os.listdir(self.download_dir) if f not in snapshot]
+            pdf_files = [f for f in new_files if f.endswith('.pdf')]
+            
+            # Chrome writes to a .crdownload file and renames it once the download is done
+            if pdf_files and not any(f.endswith(('.crdownload', '.part', '.tmp')) for f in new_files):
+                return pdf_files[0]
+            return False
+        
+        try:
+            # returns as soon as the download settles instead of sleeping a fixed time
+            downloaded = WebDriverWait(self.driver, timeout, poll_frequency=0.1).until(download_done)
+            
+            # rename to our naming convention and move it out of the worker directory
+            new_path = os.path.join(self.output_dir, filename)
+            os.rename(os.path.join(self.download_dir, downloaded), new_path)
+            log.info("Downloaded and renamed to: %s", filename)
+            return True
             
+        except TimeoutException:
+            log.warning("Download did not finish within %d seconds", timeout)
             return False
             
         except Exception as e:
-            print(f"Error checking download: {e}")
+            log.warning("Error checking download: %s", e)
             return False
     
     def save_manual_url(self, citation, index, url):
@@ -215,185 +620,272 @@ class GoogleScholarPDFDownloader:
             f.write(f"Google Scholar URL: {url}\n\n")
             f.write("This paper needs to be downloaded manually.\n")
     
+
+
+class GoogleScholarPDFDownloader:
+    def __init__(self, num_workers=NUM_WORKERS, debugger_address=None):
+        self.output_dir = "xpcs_publications"
+        os.makedirs(self.output_dir, exist_ok=True)
+        # host:port of a Chrome to reuse across runs instead of starting a new one per worker
+        self.debugger_address = debugger_address
+        self.num_workers = num_workers
+        # held by whichever worker is using an attached Chrome, whose download directory is shared
+        self.browser_lock = threading.Lock() if debugger_address else None
+        # open lockfile while this run is attached to the Chrome at debugger_address
+        self.debugger_lock_fh = None
+        
+        # one keep-alive session shared by every worker; the per-host pool must hold at least
+        # one connection per worker or urllib3 discards the extras ("connection pool is full"),
+        # and enough hosts are kept that a publisher seen earlier in the batch is still warm
+        self.session = requests.Session()
+        self.session.headers.update({"User-Agent": USER_AGENT})
+        adapter = HTTPAdapter(pool_connections=HOST_POOLS, pool_maxsize=max(16, num_workers), pool_block=False)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        
+        # append one JSON line per citation as soon as it's done, so a crash doesn't lose the log;
+        # every run appends to the same file and tags its lines with when it started
+        self.run_id = datetime.now().strftime("%Y%m%d_%H%M%S")
+        self.log_file = os.path.join(self.output_dir, "download_log.jsonl")
+        self.log_fh = open(self.log_file, 'a', buffering=1)
+        self.log_lock = threading.Lock()
+        
+        # one semaphore per PDF host, created on first use
+        self.host_slots = {}
+        self.host_slots_lock = threading.Lock()
+        
+        # only requests that actually reach Scholar take a token; cache hits and
+        # direct PDF downloads don't, so they never wait on it
+        self.scholar_limiter = TokenBucket(SCHOLAR_QUERIES_PER_MINUTE, SCHOLAR_QUERIES_PER_MINUTE / 60)
+        
+        # monotonic time until which no worker may query Scholar; each CAPTCHA backoff
+        # only ever pushes it later, so overlapping pauses can't end each other early
+        self.scholar_paused_until = 0
+        self.scholar_pause_lock = threading.Lock()
+        
+        # remembers which citations were already downloaded, across runs
+        self.cache = sqlite3.connect(os.path.join(self.output_dir, "cache.db"), check_same_thread=False)
+        self.cache.execute("CREATE TABLE IF NOT EXISTS cache(h TEXT PRIMARY KEY, status TEXT, url TEXT, path TEXT)")
+        self.cache.commit()
+        self.cache_lock = threading.Lock()
+    
+    def lock_debugger(self):
+        """take the lockfile for debugger_address, waiting while another run is attached"""
+        if self.debugger_lock_fh is not None:
+            return
+        
+        name = "xpcs_chrome_" + re.sub(r'[^\w.-]', '_', self.debugger_address) + ".lock"
+        fh = open(os.path.join(tempfile.gettempdir(), name), 'a+')
+        try:
+            fcntl.flock(fh, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            log.info("Another run is attached to Chrome at %s, waiting for it...", self.debugger_address)
+            fcntl.flock(fh, fcntl.LOCK_EX)
+        
+        # record who holds it, for anyone looking at a stuck lock
+        fh.seek(0)
+        fh.truncate()
+        fh.write(f"{self.debugger_address} {os.getpid()}\n")
+        fh.flush()
+        self.debugger_lock_fh = fh
+    
+    def unlock_debugger(self):
+        """release the debugger_address lockfile, if this run took it"""
+        if self.debugger_lock_fh is not None:
+            self.debugger_lock_fh.close()  # closing the file drops the flock
+            self.debugger_lock_fh = None
+    
+    def pause_scholar(self, delay):
+        """hold every worker's Scholar queries for at least `delay` seconds from now"""
+        with self.scholar_pause_lock:
+            self.scholar_paused_until = max(self.scholar_paused_until, time.monotonic() + delay)
+    
+    def wait_for_scholar(self):
+        """block until no CAPTCHA pause is in effect"""
+        while True:
+            with self.scholar_pause_lock:
+                remaining = self.scholar_paused_until - time.monotonic()
+            if remaining <= 0:
+                return
+            time.sleep(remaining)
+    
+    def close(self):
+        """close the download log, the cache and the shared HTTP session"""
+        self.unlock_debugger()
+        with self.log_lock:
+            self.log_fh.close()
+        with self.cache_lock:
+            self.cache.close()
+        self.session.close()
+    
+    def host_slot(self, url):
+        """return the semaphore limiting concurrent downloads from url's host"""
+        host = urlparse(url).netloc
+        with self.host_slots_lock:
+            if host not in self.host_slots:
+                self.host_slots[host] = threading.Semaphore(DOWNLOADS_PER_HOST)
+            return self.host_slots[host]
+    
+    def log(self, entry):
+        """append one entry to the JSON Lines download log"""
+        line = json.dumps({'run': self.run_id, **entry}) + "\n"
+        with self.log_lock:
+            self.log_fh.write(line)
+    
+    def cache_lookup(self, citation):
+        """return the cache entry for a citation if its PDF is still on disk"""
+        h = hashlib.md5(citation.encode()).hexdigest()
+        with self.cache_lock:
+            row = self.cache.execute("SELECT status, url, path FROM cache WHERE h = ?", (h,)).fetchone()
+        
+        if row is None:
+            return None
+        
+        status, url, path = row
+        # the PDF may have been moved or deleted since it was cached
+        if status != 'success' or not check_download_complete(path):
+            return None
+        return {'status': status, 'url': url, 'path': path}
+    
+    def cache_store(self, citation, status, url, path):
+        """record a resolved citation in the cache"""
+        h = hashlib.md5(citation.encode()).hexdigest()
+        with self.cache_lock:
+            self.cache.execute("INSERT OR REPLACE INTO cache VALUES (?, ?, ?, ?)", (h, status, url, path))
+            self.cache.commit()
+    
+    def process_one(self, entry):
+        """search and download one citation on a worker borrowed from the pool"""
+        worker = self.worker_pool.get()
+        try:
+            return worker.search_and_download(entry)
+        finally:
+            self.worker_pool.put(worker)
+    
+    def pending(self, limit, path=CITATIONS_FILE):
+        """return the first `limit` citations in the file that haven't been downloaded yet"""
+        existing = {f for f in os.listdir(self.output_dir) if f.endswith('.pdf')}
+        entries = []
+        for entry in parse_citations(iter_citations(path)):
+            if entry.filename in existing or self.cache_lookup(entry.citation):
+                continue
+            entries.append(entry)
+            if len(entries) == limit:
+                break
+        return entries
+    
     def process_citations(self, citations, start_index=1):
-        """process all citations with added delays"""
-        print("AUTOMATED GOOGLE SCHOLAR PDF DOWNLOADER")
-        print("======================================")
-        print(f"Will process {len(citations)} citations starting from #{start_index}")
+        """number citations from start_index and process them concurrently"""
+        # citations can be any iterable, e.g. a lazy iter_citations() slice
+        entries = parse_citations(citations, start_index)
+        log.info("Will process %d citations starting from #%d", len(entries), start_index)
+        self.process_entries(entries)
+    
+    def process_entries(self, entries):
+        """split parsed citations across the workers and process them concurrently"""
+        log.info("AUTOMATED GOOGLE SCHOLAR PDF DOWNLOADER")
         
         success_count = 0
         
-        for i, citation in enumerate(citations):
-            actual_index = start_index + i  # calculate the actual citation number
-            if self.search_and_download(citation.strip(), actual_index):
+        # skip citations already downloaded by an earlier run, either recorded in the
+        # cache or just sitting in the output directory under their expected name
+        existing = {f for f in os.listdir(self.output_dir) if f.endswith('.pdf')}
+        jobs = []
+        for entry in entries:
+            cached = self.cache_lookup(entry.citation)
+            if cached:
+                log.info("Citation #%d already downloaded: %s", entry.index, cached['path'])
+                self.log({
+                    'status': 'cached',
+                    'citation': entry.citation,
+                    'index': entry.index,
+                    'path': cached['path']
+                })
                 success_count += 1
+                continue
             
-            # longer delay between searches to avoid blocking
-            if i < len(citations) - 1:  # don't wait after the last citation
-                delay = random.uniform(10, 20)
-                print(f"\nWaiting {delay:.1f} seconds before next search...")
-                time.sleep(delay)
-        
-        # save download log
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        log_file = os.path.join(self.output_dir, f"download_log_batch_{start_index}_{timestamp}.json")
-        with open(log_file, 'w') as f:
-            json.dump(self.download_log, f, indent=2)
-        
-        print(f"\n{'='*60}")
-        print(f"Summary: Downloaded {success_count}/{len(citations)} papers")
-        print(f"Check {self.output_dir}/ for PDFs")
-        print(f"Log saved as: {log_file}")
-        
-        # close driver
-        self.driver.quit()
-
-# citations present in the 2018 review
-# citations = [
-#     "Livet F. 2007. Diffraction with a coherent X-ray beam: dynamics and imaging. Acta Crystallogr. A 63:87–107",
-#     "Grübel G, Madsen A, Robert A. 2008. X-ray photon correlation spectroscopy (XPCS). In Soft-Matter Characterization, ed. R Borsali, R Pecora, pp. 953–95. New York: Springer",
-#     "Sutton M. 2008. A review of X-ray intensity fluctuation spectroscopy. C. R. Phys. 9:657–67",
-# ]
-
-# all 115 citations present in the 2018 review
-citations = [
-    "Livet F. 2007. Diffraction with a coherent X-ray beam: dynamics and imaging. Acta Crystallogr. A 63:87–107",
-    "Grübel G, Madsen A, Robert A. 2008. X-ray photon correlation spectroscopy (XPCS). In Soft-Matter Characterization, ed. R Borsali, R Pecora, pp. 953–95. New York: Springer",
-    "Sutton M. 2008. A review of X-ray intensity fluctuation spectroscopy. C. R. Phys. 9:657–67",
-    "Livet F, Sutton M. 2012. X-ray coherent scattering in metal physics. C. R. Phys. 13:23–32",
-    "Sinha SK, Jiang Z, Lurio LB. 2014. X-ray photon correlation spectroscopy studies of surfaces and thin films. Adv. Mater. 26:7764–85",
-    "Madsen A, Fluerasu A, Ruta B. 2016. Structural dynamics of materials probed by X-ray photon correlation spectroscopy. In Synchrotron Light Sources and Free-Electron Lasers, ed. E Jaeschke, S Khan, JR Schneider, JB Hastings, pp. 1617–41. Cham, Switz.: Springer Int.",
-    "Sutton M, Mochrie SGJ, Greytak T, Nagler SE, Berman LE, et al. 1991. Observation of speckle by diffraction with coherent X-rays. Nature 352:608–10",
-    "Miao J, Ishikawa T, Robinson IK, Murnane MM. 2015. Beyond crystallography: diffractive imaging using coherent X-ray light sources. Science 348(6234):530–35",
-    "Born M, Wolf E. 1980. Principles of Optics: Electromagnetic Theory of Propagation, Interference and Diffraction of Light. Oxford, UK: Pergamon",
-    "Goodman JW. 1985. Statistical Optics. New York: Wiley",
-    "Vartanyants IA, Singer A. 2010. Coherence properties of hard X-ray synchrotron sources and X-ray free electron lasers. New J. Phys. 12:035004",
-    "Sandy AR, Lurio LB, Mochrie SGJ, Malik A, Stephenson GB, et al. 1999. Design and characterization of an undulator beamline optimized for small-angle coherent X-ray scattering at the Advanced Photon Source. J. Synchrotron Radiat. 6:1174–84",
-    "Pfeiffer F, Zhang W, Robinson IK. 2004. Coherent grazing exit X-ray scattering geometry for probing the structure of thin films. Appl. Phys. Lett. 84:1847–49",
-    "Markowitz D, Kadanoff LP. 1963. Effect of impurities upon critical temperature of anisotropic superconductors. Phys. Rev. 131:563–75",
-    "Dierker SB, Pindak R, Fleming RM, Robinson IK, Berman L. 1995. X-ray photon-correlation spectroscopy study of Brownian motion of gold colloids in glycerol. Phys. Rev. Lett. 75:449–52",
-    "Zhang F, Allen AJ, Levine LE, Espinal L, Antonucci JM, et al. 2012. Ultra-small-angle X-ray scattering–X-ray photon correlation spectroscopy studies of incipient structural changes in amorphous calcium phosphate–based dental composites. J. Biomed. Mater. Res. A 100:1293–306",
-    "Zhang Q, Dufresne EM, Chen P, Park J, Cosgriff MP, et al. 2017. Thermal fluctuations of ferroelectric nanodomains in a ferroelectric-dielectric PbTiO3/SrTiO3 superlattice. Phys. Rev. Lett. 118:097601",
-    "Barbour A, Alatas A, Liu Y, Zhu C, Leu BM, et al. 2016. Partial glass isosymmetry transition in multiferroic hexagonal ErMnO3. Phys. Rev. B 93:054113",
-    "Singer A, Patel SKK, Uhlíř V, Kukreja R, Ulvestad A, et al. 2016. Phase coexistence and pinning of charge density waves by interfaces in chromium. Phys. Rev. B 94:174110",
-    "Shpyrko OG, Isaacs ED, Logan JM, Feng YJ, Aeppli G, et al. 2007. Direct measurement of antiferromagnetic domain fluctuations. Nature 447:68–71",
-    "Su J, Sandy AR, Mohanty J, Shpyrko OG, Sutton M. 2012. Collective pinning dynamics of charge-density waves in 1T-TaS2. Phys. Rev. B 86:205105",
-    "Fluerasu A, Sutton M, Dufresne EM. 2005. X-ray intensity fluctuation spectroscopy studies on phase-ordering systems. Phys. Rev. Lett. 94:055501",
-    "Sanborn C, Ludwig KF, Rogers MC, Sutton M. 2011. Direct measurement of microstructural avalanches during the martensitic transition of cobalt using coherent X-ray scattering. Phys. Rev. Lett. 107:015702",
-    "Livet F, Fèvre M, Beutier G, Sutton M. 2015. Ordering fluctuation dynamics in AuAgZn2. Phys. Rev. B 92:094102",
-    "Pierce MS, Chang KC, Hennessy D, Komanicky V, Sprung M, et al. 2009. Surface X-ray speckles: coherent surface diffraction from Au(001). Phys. Rev. Lett. 103:165501",
-    "Pierce MS, Hennessy DC, Chang KC, Komanicky V, Strzalka J, et al. 2011. Persistent oscillations of X-ray speckles: Pt(001) step flow. Appl. Phys. Lett. 99:121910",
-    "Pierce MS, Komanicky V, Barbour A, Hennessy DC, Su JD, et al. 2011. In-situ coherent X-ray scattering and scanning tunneling microscopy studies of hexagonally reconstructed Au(001) in electrolytes. ECS Trans. 35:71–81",
-    "Pierce MS, Komanicky V, Barbour A, Hennessy DC, Zhu CH, et al. 2012. Dynamics of the Au(001) surface in electrolytes: in situ coherent X-ray scattering. Phys. Rev. B 86:085410",
-    "Pierce MS, Barbour A, Komanicky V, Hennessy D, You H. 2012. Coherent X-ray scattering experiments of Pt(001) surface dynamics near a roughening transition. Phys. Rev. B 86:184108",
-    "Karl RM, Barbour A, Komanicky V, Zhu CH, Sandy A, et al. 2015. Charge-induced equilibrium dynamics and structure at the Ag(001)-electrolyte interface. Phys. Chem. Chem. Phys. 17:16682–87",
-    "Narayanan RA, Thiyagarajan P, Lewis S, Bansal A, Schadler LS, Lurio LB. 2006. Dynamics and internal stress at the nanoscale related to unique thermomechanical behavior in polymer nanocomposites. Phys. Rev. Lett. 97:075505",
-    "Narayanan S, Lee DR, Hagman A, Li XF, Wang J. 2007. Particle dynamics in polymer-metal nanocomposite thin films on nanometer-length scales. Phys. Rev. Lett. 98:185506",
-    "Kandar AK, Srivastava S, Basu JK, Mukhopadhyay MK, Seifert S, Narayanan S. 2009. Unusual dynamical arrest in polymer grafted nanoparticles. J. Chem. Phys. 130:121102",
-    "Srivastava S, Kandar AK, Basu JK, Mukhopadhyay MK, Lurio LB, et al. 2009. Complex dynamics in polymer nanocomposites. Phys. Rev. E 79:021408",
-    "Srivastava S, Chandran S, Kandar AK, Sarika CK, Basu JK, et al. 2010. Communication: Unusual dynamics of hybrid nanoparticles and their binary mixtures. J. Chem. Phys. 133:151105",
-    "Sikorski M, Sandy AR, Narayanan S. 2011. Depletion-induced structure and dynamics in bimodal colloidal suspensions. Phys. Rev. Lett. 106:188301",
-    "Guo H, Bourret G, Lennox RB, Sutton M, Harden JL, Leheny RL. 2012. Entanglement-controlled subdiffusion of nanoparticles within concentrated polymer solutions. Phys. Rev. Lett. 109:055901",
-    "Kim D, Srivastava S, Narayanan S, Archer LA. 2012. Polymer nanocomposites: polymer and particle dynamics. Soft Matter 8:10813–18",
-    "Srivastava S, Archer LA, Narayanan S. 2013. Structure and transport anomalies in soft colloids. Phys. Rev. Lett. 110:148302",
-    "Jang WS, Koo P, Bryson K, Narayanan S, Sandy A, et al. 2014. Dynamics of cadmium sulfide nanoparticles within polystyrene melts. Macromolecules 47:6483–90",
-    "Agrawal A, Yu H-Y, Srivastava S, Choudhury S, Narayanan S, Archer LA. 2015. Dynamics and yielding of binary self-suspended nanoparticle fluids. Soft Matter 11:5224–34",
-    "Ranka M, Varkey N, Ramakrishnan S, Zukoski CF. 2015. Impact of small changes in particle surface chemistry for unentangled polymer nanocomposites. Soft Matter 11:1634–45",
-    "Srivastava S, Agarwal P, Mangal R, Koch DL, Narayanan S, Archer LA. 2015. Hyperdiffusive dynamics in Newtonian nanoparticle fluids. ACS Macro Lett. 4:1149–53",
-    "Grein-Iankovski A, Riegel-Vidotti IC, Simas-Tosin FF, Narayanan S, Leheny RL, Sandy AR. 2016. Exploring the relationship between nanoscale dynamics and macroscopic rheology in natural polymer gums. Soft Matter 12:9321–29",
-    "Jang WS, Koo P, Bryson K, Narayanan S, Sandy AR, et al. 2016. The static structure and dynamics of cadmium sulfide nanoparticles within poly(styrene-block-isoprene) diblock copolymer melts. Macromol. Chem. Phys. 217:591–98",
-    "Liu SQ, Senses E, Jiao Y, Narayanan S, Akcora P. 2016. Structure and entanglement factors on dynamics of polymer-grafted nanoparticles. ACS Macro Lett. 5:569–73",
-    "Mangal R, Srivastava S, Narayanan S, Archer LA. 2016. Size-dependent particle dynamics in entangled polymer nanocomposites. Langmuir 32:596–603",
-    "Poling-Skutvik R, Mongcopa KIS, Faraone A, Narayanan S, Conrad JC, Krishnamoorti R. 2016. Structure and dynamics of interacting nanoparticles in semidilute polymer solutions. Macromolecules 49:6568–77",
-    "Srivastava S, Kishore S, Narayanan S, Sandy AR, Bhatia SR. 2016. Multiple dynamic regimes in colloid-polymer dispersions: new insight using X-ray photon correlation spectroscopy. J. Polym. Sci. B Polym. Phys. 54:752–60",
-    "Lee J, Grein-Iankovski A, Narayanan S, Leheny RL. 2017. Nanorod mobility within entangled wormlike micelle solutions. Macromolecules 50:406–15",
-    "Senses E, Ansar SM, Kitchens CL, Mao Y, Narayanan S, et al. 2017. Small particle driven chain disentanglements in polymer nanocomposites. Phys. Rev. Lett. 118:147801",
-    "Broennimann C, Eikenberry EF, Henrich B, Horisberger R, Huelsen G, et al. 2006. The PILATUS 1M detector. J. Synchrotron Radiat. 13:120–30",
-    "Johnson I, Bergamaschi A, Buitenhuis J, Dinapoli R, Greiffenberg D, et al. 2012. Capturing dynamics with Eiger, a fast-framing X-ray detector. J. Synchrotron Radiat. 19:1001–5",
-    "Pennicard D, Lange S, Smoljanin S, Hirsemann H, Graafsma H. 2012. LAMBDA—Large Area Medipix3-Based Detector Array. J. Instrum. 7:C11009",
-    "Chen M. 2011. A brief overview of bulk metallic glasses. NPG Asia Mater. 3:82–90",
-    "Schroers J. 2013. Bulk metallic glasses. Phys. Today 66:32–37",
-    "Byrne CJ, Eldrup M. 2008. Bulk metallic glasses. Science 321:502–3",
-    "Martinez L-M, Angell CA. 2001. A thermodynamic connection to the fragility of glass-forming liquids. Nature 410:663–67",
-    "Berthier L, Biroli G, Bouchaud J-P, Cipelletti L, Masri DE, et al. 2005. Direct experimental evidence of a growing length scale accompanying the glass transition. Science 310:1797–800",
-    "Ruta B, Baldi G, Chushkin Y, Ruffle B, Cristofolini L, et al. 2014. Revealing the fast atomic motion of network glasses. Nat. Commun. 5:3939",
-    "Giordano VM, Ruta B. 2016. Unveiling the structural arrangements responsible for the atomic dynamics in metallic glasses during physical aging. Nat. Commun. 7:10344",
-    "Ruta B, Chushkin Y, Monaco G, Cipelletti L, Pineda E, et al. 2012. Atomic-scale relaxation dynamics and aging in a metallic glass probed by X-ray photon correlation spectroscopy. Phys. Rev. Lett. 109:165701",
-    "Evenson Z, Ruta B, Hechler S, Stolpe M, Pineda E, et al. 2015. X-ray photon correlation spectroscopy reveals intermittent aging dynamics in a metallic glass. Phys. Rev. Lett. 115:175701",
-    "Thurn-Albrecht T, Steffen W, Patkowski A, Meier G, Fischer EW, et al. 1996. Photon correlation spectroscopy of colloidal palladium using a coherent X-ray beam. Phys. Rev. Lett. 77:5437–40",
-    "Lal J, Abernathy D, Auvray L, Diat O, Grübel G. 2001. Dynamics and correlations in magnetic colloidal systems studied by X-ray photon correlation spectroscopy. Eur. Phys. J. E 4:263–71",
-    "Autenrieth T, Robert A, Wagner J, Grübel G. 2007. The dynamic behavior of magnetic colloids in suspension. J. Appl. Crystallogr. 40:S250–53",
-    "Fluerasu A, Moussaïd A, Madsen A, Schofield A. 2007. Slow dynamics and aging in colloidal gels studied by X-ray photon correlation spectroscopy. Phys. Rev. E 76:010401(R)",
-    "Trappe V, Pitard E, Ramos L, Robert A, Bissig H, Cipelletti L. 2007. Investigation of q-dependent dynamical heterogeneity in a colloidal gel by X-ray photon correlation spectroscopy. Phys. Rev. E 76:051404",
-    "Robert A, Wagner J, Haertl W, Autenrieth T, Grübel G. 2008. Dynamics in dense suspensions of charge-stabilized colloidal particles. Eur. Phys. J. E 25:77–81",
-    "Guo HY, Ramakrishnan S, Harden JL, Leheny RL. 2010. Connecting nanoscale motion and rheology of gel-forming colloidal suspensions. Phys. Rev. E 81:050401(R)",
-    "Guo H, Ramakrishnan S, Harden JL, Leheny RL. 2011. Gel formation and aging in weakly attractive nanocolloid suspensions at intermediate concentrations. J. Chem. Phys. 135:154903",
-    "Spannuth M, Mochrie SGJ, Peppin SSL, Wettlaufer JS. 2011. Dynamics of colloidal particles in ice. J. Chem. Phys. 135:224706",
-    "Orsi D, Fluerasu A, Moussaid A, Zontone F, Cristofolini L, Madsen A. 2012. Dynamics in dense hard-sphere colloidal suspensions. Phys. Rev. E 85:011402",
-    "Westermeier F, Fischer B, Roseker W, Grübel G, Naegele G, Heinen M. 2012. Structure and short-time dynamics in concentrated suspensions of charged colloids. J. Chem. Phys. 137:114504",
-    "Angelini R, Zulian L, Fluerasu A, Madsen A, Ruocco G, Ruzicka B. 2013. Dichotomic aging behaviour in a colloidal glass. Soft Matter 9:10955–59",
-    "Zhang F, Allen AJ, Levine LE, Ilavsky J, Long GG. 2013. Structure and dynamics studies of concentrated micrometer-sized colloidal suspensions. Langmuir 29:1379–87",
-    "Angelini R, Madsen A, Fluerasu A, Ruocco G, Ruzicka B. 2014. Aging behavior of the localization length in a colloidal glass. Colloids Surf. A Physicochem. Eng. Asp. 460:118–22",
-    "Angelini R, Zaccarelli E, Marques FAD, Sztucki M, Fluerasu A, et al. 2014. Glass-glass transition during aging of a colloidal clay. Nat. Commun. 5:4049",
-    "Marques FAD, Angelini R, Zaccarelli E, Farago B, Ruta B, et al. 2015. Structural and microscopic relaxations in a colloidal glass. Soft Matter 11:466–71",
-    "Pusey PN. 1991. Colloidal suspensions. In Liquids, Freezing and the Glass Transition, ed. JP Hansen, D Levesque, J Zinn-Justin, pp. 763–942. Amsterdam: Elsevier",
-    "de Gennes P-G. 1979. Scaling Concepts in Polymer Physics. Ithaca, NY: Cornell Univ. Press",
-    "Hunter GL, Weeks ER. 2012. The physics of the colloidal glass transition. Rep. Prog. Phys. 75:066501",
-    "Lumma D, Lurio LB, Borthwick MA, Falus P, Mochrie SGJ. 2000. Structure and dynamics of concentrated dispersions of polystyrene latex spheres in glycerol: static and dynamic X-ray scattering. Phys. Rev. E 62:8258–69",
-    "Beysens D, Narayanan T. 1999. Wetting-induced aggregation of colloids. J. Stat. Phys. 95:997–1008",
-    "Pontoni D, Narayanan T, Petit JM, Grübel G, Beysens D. 2003. Microstructure and dynamics near an attractive colloidal glass transition. Phys. Rev. Lett. 90:188301",
-    "Lu XH, Mochrie SGJ, Narayanan S, Sandy AR, Sprung M. 2008. How a liquid becomes a glass both on cooling and on heating. Phys. Rev. Lett. 100:045701",
-    "Lu XH, Mochrie SGJ, Narayanan S, Sandy AR, Sprung M. 2010. Temperature-dependent structural arrest of silica colloids in a water-lutidine binary mixture. Soft Matter 6:6160–77",
-    "Falus P, Borthwick MA, Mochrie SGJ. 2004. Fast CCD camera for X-ray photon correlation spectroscopy and time-resolved X-ray scattering and imaging. Rev. Sci. Instrum. 75:4383–400",
-    "Götze W, Sperl M. 2002. Logarithmic relaxation in glass-forming systems. Phys. Rev. E 66:011405",
-    "Cipelletti L, Manley S, Ball RC, Weitz DA. 2000. Universal aging features in the restructuring of fractal colloidal gels. Phys. Rev. Lett. 84(10):2275–78",
-    "Bouchaud JP, Pitard E. 2001. Anomalous dynamical light scattering in soft glassy gels. Eur. Phys. J. E 6:231–36",
-    "Akcora P, Kumar SK, Moll J, Lewis S, Schadler LS, et al. 2010. \"Gel-like\" mechanical reinforcement in polymer nanocomposite melts. Macromolecules 43:1003–10",
-    "Chen XM, Thampy V, Mazzoli C, Barbour AM, Miao H, et al. 2016. Remarkable stability of charge density wave order in La1.875Ba0.125CuO4. Phys. Rev. Lett. 117:167001",
-    "Evans PG, Isaacs ED, Aeppli G, Cai Z, Lai B. 2002. X-ray microdiffraction images of antiferromagnetic domain evolution in chromium. Science 295(5557):1042–45",
-    "Tripathi A, Mohanty J, Dietze SH, Shpyrko OG, Shipton E, et al. 2011. Dichroic coherent diffractive imaging. PNAS 108:13393–98",
-    "Parkin SS, Hayashi M, Thomas L. 2008. Magnetic domain-wall racetrack memory. Science 320:190–94",
-    "Allwood DA, Xiong G, Faulkner CC, Atkinson D, Petit D, Cowburn RP. 2005. Magnetic domain-wall logic. Science 309:1688–92",
-    "Malik A, Sandy AR, Lurio LB, Stephenson GB, Mochrie SGJ, et al. 1998. Coherent X-ray study of fluctuations during domain coarsening. Phys. Rev. Lett. 81:5832–35",
-    "Bikondoa O. 2017. On the use of two-time correlation functions for X-ray photon correlation spectroscopy data analysis. J. Appl. Crystallogr. 50:357–68",
-    "Bonn D, Kellay H, Tanaka H, Wegdam G, Meunier J. 1999. Laponite: What is the difference between a gel and a glass? Langmuir 15(22):7534–36",
-    "Zaccarelli E. 2007. Colloidal gels: equilibrium and non-equilibrium routes. J. Phys. Condens. Matter 19:323101",
-    "Zhang Q, Dufresne EM, Grybos P, Kmon P, Maj P, et al. 2016. Submillisecond X-ray photon correlation spectroscopy from a pixel array detector with fast dual gating and no readout dead-time. J. Synchrotron Radiat. 23:679–84",
-    "Grybos P, Kmon P, Maj P, Szczygiel R. 2016. 32k channel readout IC for single photon counting pixel detectors with 75 µm pitch, dead time of 85 ns, 9 e− offset spread and 2% rms gain spread. IEEE Trans. Nucl. Sci. 63:1155–61",
-    "Zhang Q, Bahadur D, Dufresne EM, Grybos P, Kmon P, et al. 2017. Dynamic scaling of colloidal gel formation at intermediate concentrations. Phys. Rev. Lett. 119:178006",
-    "Ramakrishnan S, Chen YL, Schweizer KS, Zukoski CF. 2004. Elasticity and clustering in concentrated depletion gels. Phys. Rev. E 70:040401",
-    "Zia RN, Landrum BJ, Russel WB. 2014. A micro-mechanical study of coarsening and rheology of colloidal gels: cage building, cage hopping, and Smoluchowski's ratchet. J. Rheol. 58(5):1121–57",
-    "Varga Z, Wang G, Swan J. 2015. The hydrodynamics of colloidal gelation. Soft Matter 11(46):9009–19",
-    "Ulvestad A, Singer A, Clark JN, Cho HM, Kim JW, et al. 2015. Topological defect dynamics in operando battery nanoparticles. Science 348:1344–47",
-    "Pierce MS, Moore RG, Sorensen LB, Kevan SD, Hellwig O, et al. 2003. Quasistatic X-ray speckle metrology of microscopic magnetic return-point memory. Phys. Rev. Lett. 90:175502",
-    "Rogers MC, Chen K, Andrzejewski L, Narayanan S, Ramakrishnan S, et al. 2014. Echoes in X-ray speckles track nanometer-scale plastic events in colloidal gels under shear. Phys. Rev. E 90:062310",
-    "Ruta B, Baldi G, Monaco G, Chushkin Y. 2013. Compressed correlation functions and fast aging dynamics in metallic glasses. J. Chem. Phys. 138:054508",
-    "Evenson Z, Payes-Playa A, Chushkin Y, di Michiel M, Pineda E, Ruta B. 2017. Comparing the atomic and macroscopic aging dynamics in an amorphous and partially crystalline Zr44Ti11Ni10Cu10Be25 bulk metallic glass. J. Mater. Res. 32:2014–21",
-    "Eriksson M, van der Veen JF, Quitmann C. 2014. Diffraction-limited storage rings—a window to the science of tomorrow. J. Synchrotron Radiat. 21:837–42",
-    "Hettel R. 2014. DLSR design and plans: an international overview. J. Synchrotron Radiat. 21:843–55",
-    "Jakeman E. 1973. Photon correlation. In Photon Correlation and Light Beating Spectroscopy, ed. HZ Cummins, ER Pike, pp. 75–149. New York: Plenum"
-]
-
-if __name__ == "__main__":
-
-    #print(f"len of citations: {len(citations)}")
+            if entry.filename in existing:
+                log.info("Citation #%d already downloaded: %s", entry.index, entry.filename)
+                self.log({
+                    'status': 'exists',
+                    'citation': entry.citation,
+                    'index': entry.index,
+                    'path': os.path.join(self.output_dir, entry.filename)
+                })
+                success_count += 1
+                continue
+            
+            jobs.append(entry)
+        
+        num_workers = max(1, min(self.num_workers, len(jobs)))
+        log.info("Using %d workers", num_workers)
+        
+        # each citation borrows whichever worker (and its browser) is free, so a slow
+        # citation doesn't hold up a whole pre-assigned chunk
+        workers = [Worker(self, worker_id) for worker_id in range(num_workers)]
+        self.worker_pool = queue.Queue()
+        for worker in workers:
+            self.worker_pool.put(worker)
+        
+        try:
+            # pacing between Scholar queries is left to the shared rate limiter
+            with ThreadPoolExecutor(max_workers=num_workers) as executor:
+                for downloaded in executor.map(self.process_one, jobs):
+                    if downloaded:
+                        success_count += 1
+        finally:
+            # close every browser, then let another run attach to a shared Chrome
+            for worker in workers:
+                worker.close()
+            self.unlock_debugger()
+        
+        log.info("Summary: Downloaded %d/%d papers", success_count, len(entries))
+        log.info("Check %s/ for PDFs", self.output_dir)
+        log.info("Log saved as: %s", self.log_file)
 
-    #batch_citations = citations[3:20]
-    #batch_citations = citations[20:40] # get docs 21 - 40
-    #batch_citations = citations[36:40] # get docs 37 - 40
-    #batch_citations = citations[40:60] # get docs 41 - 60
-    #batch_citations = citations[60:80] # get docs 61 - 80
-    #batch_citations = citations[80:100] # get docs 81 - 100
 
-    batch_citations = citations[100:115] # get docs 101 - 115
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Download the PDFs cited in the 2018 XPCS review from Google Scholar")
+    parser.add_argument("--citations-file", default=CITATIONS_FILE,
+                        help="JSON Lines file with one citation string per line (default: citations.jsonl)")
+    parser.add_argument("--start", type=int, default=None, help="number of the first citation to process (default: 1)")
+    # --pending picks its own citations, so it can't be combined with a range
+    selection = parser.add_mutually_exclusive_group()
+    selection.add_argument("--count", type=int, default=None, help="how many citations to process (default: all the rest)")
+    selection.add_argument("--end", type=int, default=None, help="number of the last citation to process, inclusive")
+    selection.add_argument("--pending", type=int, default=None, metavar="K",
+                           help="process the first K citations not downloaded yet")
+    parser.add_argument("--debugger-address", default=None,
+                        help="host:port of a running Chrome to attach to, e.g. 127.0.0.1:9222")
+    parser.add_argument("--verbose", action="store_true", help="also log every link that is looked at")
+    args = parser.parse_args()
+    if args.pending is not None:
+        if args.start is not None:
+            parser.error("argument --pending: not allowed with argument --start")
+        if args.pending < 1:
+            parser.error("--pending must be at least 1")
+    if args.start is None:
+        args.start = 1
+    if args.start < 1:
+        parser.error("--start must be at least 1")
+    if args.end is not None:
+        if args.end < args.start:
+            parser.error("--end must not be lower than --start")
+        args.count = args.end - args.start + 1
 
-    print(f"Processing citations 101-115 ({len(batch_citations)} total)")
+    # only this script's logger goes to DEBUG; selenium's and urllib3's are far too chatty
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(threadName)s %(levelname)s %(message)s")
+    log.setLevel(logging.DEBUG if args.verbose else logging.INFO)
 
-    downloader = GoogleScholarPDFDownloader()
-    downloader.process_citations(batch_citations, start_index=101)
+    downloader = GoogleScholarPDFDownloader(debugger_address=args.debugger_address)
+    try:
+        if args.pending is not None:
+            entries = downloader.pending(args.pending, args.citations_file)
+            log.info("Will process %d pending citations", len(entries))
+            downloader.process_entries(entries)
+        else:
+            downloader.process_citations(iter_citations(args.citations_file, args.start, args.count), start_index=args.start)
+    finally:
+        downloader.close()
 
-    print("\n\n Completed downloads. \n\n")
-    
-    print("\n" + "="*60)
-    print("Batch complete!")
-    #print("\nNext batch would be citations 101-115:")
+    log.info("Batch complete!")